@@ -20,7 +20,8 @@ from pathlib import Path
 from typing import List, Optional
 
 from dependencies.source.source_dependency_config import SourceDependencyConfig
-from dependencies.source.source_dependency_installer import install_source_dependency
+from dependencies.source.source_dependency_installer import install_source_dependency, \
+    prefetch_source_dependencies
 from utils.collections import partition
 from utils.download import download
 from utils.importlib_utils import invalidate_python_modules_cache
@@ -156,8 +157,8 @@ class DependencyInstaller:
         deps = self.resolve_dependencies(deps)
         working_dir = self.common_working_dir / 'source'
         download_dir = self.download_cache_dir / 'source'
-        for dependency in deps:
-            config = SourceDependencyConfig(
+        configs = {
+            dependency: SourceDependencyConfig(
                 os_name=self.os_name,
                 os_version=self.os_version,
                 download_dir=download_dir / dependency,
@@ -167,7 +168,11 @@ class DependencyInstaller:
                 with_proto='yes' if 'grpc' in deps else 'no',
                 force=self.force
             )
-            install_source_dependency(dependency, config)
+            for dependency in deps
+        }
+        prefetch_source_dependencies(configs)
+        for dependency in deps:
+            install_source_dependency(dependency, configs[dependency])
 
     def resolve_dependencies(self, dependencies: List[str]) -> List[str]:
         pending = dependencies[::-1]
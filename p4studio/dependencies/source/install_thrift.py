@@ -15,55 +15,229 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import hashlib
 import os
+import shlex
+import tarfile
+from functools import lru_cache
 from pathlib import Path
+from shutil import which
+from typing import Dict, Tuple
 
 from dependencies.source.source_dependency_config import SourceDependencyConfig
+from utils.exceptions import ApplicationException
 from utils.pkg_config import check_pkg_config
 from utils.processes import execute
 
 _THRIFT_FILE = 'thrift.tar.gz'
+_THRIFT_FILE_ZST = 'thrift.tar.zst'
+_HASH_CHUNK_SIZE = 1 << 20
 
 
-def download_thrift(config: SourceDependencyConfig) -> None:
-    attrs = config.dependency_manager().source_dependency_attributes("thrift")
+def _use_zstd(attrs: Dict[str, str]) -> bool:
+    """zstd decompresses several times faster than gzip at similar ratios;
+    prefer a .tar.zst mirror when the manifest offers one and zstd is here."""
+    return 'url_zst' in attrs and which('zstd') is not None
 
-    thrift_package = config.download_dir(ensure_exists=True) / _THRIFT_FILE
-    if not thrift_package.exists():
-        execute("wget {} -nv -O {}".format(attrs["url"], thrift_package))
 
+def _thrift_package_name(attrs: Dict[str, str]) -> str:
+    return _THRIFT_FILE_ZST if _use_zstd(attrs) else _THRIFT_FILE
 
-def install_thrift(config: SourceDependencyConfig) -> None:
-    attrs = config.dependency_manager().source_dependency_attributes("thrift")
-    version = attrs["version"]
 
-    if not config.force and _is_thrift_installed(version, config.install_dir):
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open('rb') as file:
+        for chunk in iter(lambda: file.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _tarball_sha256(tarball: Path) -> str:
+    """Returns the sha256 of the tarball, using a sidecar file to avoid rehashing."""
+    sidecar = tarball.with_name(tarball.name + '.sha256')
+    if sidecar.exists() and sidecar.stat().st_mtime >= tarball.stat().st_mtime:
+        return sidecar.read_text().strip()
+    digest = _file_sha256(tarball)
+    sidecar.write_text(digest)
+    return digest
+
+
+def _extract_tarball(tarball: Path, dest: Path) -> None:
+    """Unpacks the tarball into dest, dropping the leading path component.
+
+    Prefers pigz, which fans gzip decompression out across cores while tar
+    only unpacks. Otherwise streams through tarfile in pipe mode ('r|gz'), so decompression and
+    unpacking happen in one pass without spawning a tar subprocess. Pipe
+    mode (not 'r:gz') keeps reads linear and on the buffered-decompression
+    fast path (bpo-34043); the 1 MiB bufsize matches the hashing chunk size
+    and amortizes read syscalls against zlib's granularity.
+    """
+    if tarball.name.endswith('.zst'):
+        execute(['tar', '--zstd', '-xf', str(tarball),
+                 '--strip-components', '1', '-C', str(dest)])
         return
+    if which('pigz'):
+        execute(['tar', '-I', 'pigz', '-xf', str(tarball),
+                 '--strip-components', '1', '-C', str(dest)])
+        return
+    with tarball.open('rb') as file, \
+            tarfile.open(fileobj=file, mode='r|gz', bufsize=_HASH_CHUNK_SIZE) as tar:
+        for member in tar:
+            stripped = member.name.partition('/')[2]
+            if not stripped:
+                continue
+            member.name = stripped
+            if member.islnk():
+                member.linkname = member.linkname.partition('/')[2]
+            tar.extract(member, dest)
+
+
+def _fetch(url: str, dest: Path) -> None:
+    """Downloads url to dest, multi-connection via aria2c when available."""
+    if which('aria2c'):
+        execute(['aria2c', '-x16', '-s16', '--min-split-size=1M',
+                 '--max-connection-per-server=16',
+                 '-d', str(dest.parent), '-o', dest.name, url])
+    else:
+        execute(['wget', url, '-nv', '-O', str(dest)])
+
+
+@lru_cache(maxsize=None)
+def _resolve(config: SourceDependencyConfig) -> Tuple[Dict[str, str], Path]:
+    """Returns the thrift attributes and tarball path for config, once.
+
+    Attribute lookup re-merges the dependency manifests on every call, so
+    the result is cached per config (configs hash by identity) and shared
+    between the download and install entry points.
+    """
+    attrs = config.dependency_manager().source_dependency_attributes("thrift")
+    thrift_package = config.download_dir(ensure_exists=True) / _thrift_package_name(attrs)
+    return attrs, thrift_package
 
-    download_thrift(config)
-    build_dir = config.build_dir()
-    thrift_package = config.download_dir(ensure_exists=True) / _THRIFT_FILE
-    execute("tar xf {} --strip-components 1 -C {}".format(thrift_package, build_dir))
 
-    build_dir = build_dir / "thrift_build"
-    os.makedirs(build_dir, exist_ok=True)
+def download_thrift(config: SourceDependencyConfig) -> None:
+    attrs, thrift_package = _resolve(config)
+    _download_thrift(attrs, thrift_package)
+
+
+def _download_thrift(attrs: Dict[str, str], thrift_package: Path) -> None:
+    if _use_zstd(attrs):
+        url = attrs['url_zst']
+        expected_sha256 = attrs.get('sha256_zst')
+    else:
+        url = attrs['url']
+        expected_sha256 = attrs.get('sha256')
+    if thrift_package.exists():
+        if expected_sha256 is None or _tarball_sha256(thrift_package) == expected_sha256:
+            return
+        # Partial or corrupt artifact; discard and fetch again
+        thrift_package.unlink()
+    _fetch(url, thrift_package)
+    actual_sha256 = _tarball_sha256(thrift_package)
+    if expected_sha256 is not None and actual_sha256 != expected_sha256:
+        raise ApplicationException(
+            "Checksum mismatch for {}: expected {}, got {}".format(
+                thrift_package, expected_sha256, actual_sha256))
 
-    # Set the C++ standard to 17 and other flags
-    cmake_flags = (
-        f"{attrs['flags']} "
-        f"-DCMAKE_CXX_STANDARD=17 "
-        f"-DCMAKE_PREFIX_PATH={config.install_dir} "
-        f"-DCMAKE_INSTALL_PREFIX={config.install_dir} "
-        f"-DCMAKE_INSTALL_RPATH={config.install_dir} "
-        "-DCMAKE_POLICY_VERSION_MINIMUM=3.12 -DBUILD_SHARED_LIBS=ON "
-    )
 
-    # Run CMake to configure Thrift
-    execute(f"cmake {cmake_flags} ..", build_dir)
+def install_thrift(config: SourceDependencyConfig) -> None:
+    attrs, thrift_package = _resolve(config)
+    version = attrs["version"]
+
+    # The stamp is written only after a complete install, so its presence
+    # answers "is this version installed?" with a single stat
+    stamp = config.install_dir / '.stamps' / f'thrift-{version}.ok'
+    if not config.force:
+        if stamp.exists():
+            return
+        if _is_thrift_installed(version, config.install_dir):
+            return
+
+    _download_thrift(attrs, thrift_package)
+    tarball_digest = _tarball_sha256(thrift_package)
+
+    # Content-addressed source tree: the same tarball always lands in the
+    # same directory, so reruns (including --force) reuse the extracted
+    # sources and the CMakeCache/object files that sit next to them
+    source_dir = config.build_dir() / f'thrift-{tarball_digest[:12]}'
+    extracted_marker = source_dir / '.extracted'
+    if not extracted_marker.exists():
+        source_dir.mkdir(parents=True, exist_ok=True)
+        _extract_tarball(thrift_package, source_dir)
+        # Touched only after a complete unpack so an interrupted extraction
+        # is redone rather than trusted
+        extracted_marker.touch()
+
+    build_dir = source_dir / "thrift_build"
+    build_dir.mkdir(parents=True, exist_ok=True)
 
-    # Build and install Thrift
-    execute(f"cmake --build . --target install --config Release -- -j{config.jobs}", build_dir)
+    # Set the C++ standard to 17 and other flags
+    cmake_flags = shlex.split(attrs['flags']) + [
+        '-DCMAKE_CXX_STANDARD=17',
+        f'-DCMAKE_PREFIX_PATH={config.install_dir}',
+        f'-DCMAKE_INSTALL_PREFIX={config.install_dir}',
+        f'-DCMAKE_INSTALL_RPATH={config.install_dir}',
+        '-DCMAKE_POLICY_VERSION_MINIMUM=3.12',
+        '-DBUILD_SHARED_LIBS=ON',
+        # --config only affects multi-config generators; single-config
+        # Make/Ninja need the build type baked in at configure time
+        '-DCMAKE_BUILD_TYPE=Release',
+        '-DCMAKE_INTERPROCEDURAL_OPTIMIZATION=ON',
+    ]
+
+    # Compiler cache turns rebuilds of an unchanged thrift version into
+    # cache hits (e.g. after --force or a wiped build dir)
+    launcher = next((tool for tool in ('ccache', 'sccache') if which(tool)), None)
+    if launcher:
+        cmake_flags += [
+            f'-DCMAKE_C_COMPILER_LAUNCHER={launcher}',
+            f'-DCMAKE_CXX_COMPILER_LAUNCHER={launcher}',
+        ]
+
+    # Run CMake to configure Thrift; Ninja schedules parallel jobs tighter
+    # than Make when it is available. Configure deliberately waits for the
+    # full extraction above: CMake walks the whole source tree (every
+    # add_subdirectory/configure_file) during configure, so launching it as
+    # soon as the top-level CMakeLists.txt appears races the rest of the
+    # unpack and fails or mis-probes on whatever is still missing. Reruns
+    # skip both steps anyway via the content-addressed tree.
+    generator = ['-G', 'Ninja'] if which('ninja') else []
+    configure_cmd = ['cmake'] + generator + cmake_flags + ['..']
+
+    # Reconfigure only when the flags (or toolchain env) changed; an
+    # unchanged CMakeCache.txt answers the same questions 10-30 s faster.
+    # The sentinel is written after configure succeeds, so a failed or
+    # interrupted configure is always retried.
+    flags_hash = hashlib.sha256('\0'.join(
+        configure_cmd + [os.environ.get('CC', ''), os.environ.get('CXX', '')]
+    ).encode()).hexdigest()
+    flags_sentinel = build_dir / '.flags-hash'
+    if not ((build_dir / 'CMakeCache.txt').exists()
+            and flags_sentinel.exists()
+            and flags_sentinel.read_text().strip() == flags_hash):
+        execute(configure_cmd, build_dir)
+        flags_sentinel.write_text(flags_hash + '\n')
+
+    # Build and install Thrift; --parallel is generator-agnostic, unlike -j
+    # smuggled through '--'
+    execute(['cmake', '--build', '.', '--target', 'install',
+             '--config', 'Release', '--parallel', str(config.jobs)],
+            build_dir,
+            override_env={"CMAKE_BUILD_PARALLEL_LEVEL": str(config.jobs)})
+
+    stamp.parent.mkdir(parents=True, exist_ok=True)
+    stamp.write_text(_tarball_sha256(thrift_package) + '\n')
 
 
 def _is_thrift_installed(version: str, path: Path) -> bool:
-    return check_pkg_config(path, "thrift", version)
+    pc_file = path / 'lib' / 'pkgconfig' / 'thrift.pc'
+    if not pc_file.exists():
+        # pkg-config cannot succeed without the .pc file; skip the fork
+        return False
+    return _check_thrift_pkg_config(str(path), version, pc_file.stat().st_mtime)
+
+
+@lru_cache(maxsize=None)
+def _check_thrift_pkg_config(path: str, version: str, mtime: float) -> bool:
+    # mtime keys the cache so a reinstall invalidates the memoized answer
+    return check_pkg_config(Path(path), "thrift", version)
@@ -42,13 +42,12 @@ class SourceDependencyConfig:
         self.force = force
 
     def download_dir(self, ensure_exists: bool) -> Path:
-        if ensure_exists and not self._build_dir.exists():
-            execute("mkdir -p {}".format(self._download_dir))
+        if ensure_exists:
+            self._download_dir.mkdir(parents=True, exist_ok=True)
         return self._download_dir
 
     def build_dir(self, copy_download_dir: bool = False) -> Path:
-        if not self._build_dir.exists():
-            execute("mkdir -p {}".format(self._build_dir))
+        self._build_dir.mkdir(parents=True, exist_ok=True)
 
         if copy_download_dir:
             execute("cp -a {}/. {}".format(self._download_dir / '.', self._build_dir))
@@ -15,13 +15,16 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
-from dependencies.source.install_boost import install_boost
-from dependencies.source.install_bridge_utils import install_bridge_utils
-from dependencies.source.install_grpc import install_grpc
-from dependencies.source.install_libcli import install_libcli
-from dependencies.source.install_libcrafter import install_libcrafter
-from dependencies.source.install_pi import install_pi
-from dependencies.source.install_thrift import install_thrift
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict
+
+from dependencies.source.install_boost import download_boost, install_boost
+from dependencies.source.install_bridge_utils import download_bridge_utils, install_bridge_utils
+from dependencies.source.install_grpc import download_grpc, install_grpc
+from dependencies.source.install_libcli import download_libcli, install_libcli
+from dependencies.source.install_libcrafter import download_libcrafter, install_libcrafter
+from dependencies.source.install_pi import download_pi, install_pi
+from dependencies.source.install_thrift import download_thrift, install_thrift
 from dependencies.source.source_dependency_config import SourceDependencyConfig
 from utils.exceptions import ApplicationException
 from utils.terminal import compact_log
@@ -36,6 +39,41 @@ _DEP_TO_FUNC = {
     "bridge": install_bridge_utils
 }
 
+_DEP_TO_DOWNLOAD_FUNC = {
+    "libcli": download_libcli,
+    "libcrafter": download_libcrafter,
+    "pi": download_pi,
+    "boost": download_boost,
+    "grpc": download_grpc,
+    "thrift": download_thrift,
+    "bridge": download_bridge_utils
+}
+
+
+def prefetch_source_dependencies(configs: Dict[str, SourceDependencyConfig]) -> None:
+    """Downloads all source dependencies concurrently before the serial builds.
+
+    The download functions are idempotent and cache their artifacts, so the
+    network waits overlap here and the install step hits local files. Errors
+    are deliberately swallowed: the serial install path re-runs the download
+    and reports failures with its usual context. Worker threads log through
+    their own quiet CompactLog (see utils.terminal), so the interactive
+    progress line and its shared buffer stay owned by the main thread.
+    """
+    to_fetch = {name: config for name, config in configs.items() if name in _DEP_TO_DOWNLOAD_FUNC}
+    if len(to_fetch) < 2:
+        return
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [
+            executor.submit(_DEP_TO_DOWNLOAD_FUNC[name], config)
+            for name, config in to_fetch.items()
+        ]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                pass
+
 
 def install_source_dependency(name: str, config: SourceDependencyConfig) -> None:
     global _DEP_TO_FUNC
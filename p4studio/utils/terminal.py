@@ -17,6 +17,7 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 import sys
+import threading
 from typing import Any, List
 
 import click
@@ -128,9 +129,33 @@ class CompactLog:
             click.echo("\x1b[1K\r", nl=False)
 
 
+class _QuietCompactLog(CompactLog):
+    """CompactLog for worker threads: same buffering contract, but it never
+    writes to the terminal. The interactive progress line belongs to the main
+    thread; concurrent writers would interleave partial-line rewrites."""
+
+    def log(self, message: str, skip_prefix: bool = False) -> None:
+        print_debug("{}", message)
+        self.buffer.append(message)
+
+    def dump(self) -> None:
+        self.buffer = []
+
+    def reset(self, include_last: bool = False) -> None:
+        self.buffer = []
+
+
 _GLOBAL_COMPACT_LOG = CompactLog()
+_THREAD_COMPACT_LOGS = threading.local()
 
 
 def compact_log() -> CompactLog:
-    global _GLOBAL_COMPACT_LOG
-    return _GLOBAL_COMPACT_LOG
+    # Worker threads (e.g. the source-dependency prefetch) get their own
+    # quiet instance: the shared one is single-threaded by design and a
+    # failure mid-command would leave its buffer dirty for the main thread
+    if threading.current_thread() is threading.main_thread():
+        return _GLOBAL_COMPACT_LOG
+    instance = getattr(_THREAD_COMPACT_LOGS, 'instance', None)
+    if instance is None:
+        instance = _THREAD_COMPACT_LOGS.instance = _QuietCompactLog()
+    return instance